@@ -0,0 +1,26 @@
+"""
+Loads the translator script (its file name is not importable) for the tests
+"""
+
+import importlib.util
+import os
+
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("transformers")
+pytest.importorskip("flask")
+
+SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'xsukax-Offline-AI-Translator.py')
+
+
+def load_translator():
+    spec = importlib.util.spec_from_file_location("translator", SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture(scope="session")
+def translator():
+    return load_translator()
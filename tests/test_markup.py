@@ -0,0 +1,175 @@
+"""
+Round-trip tests for HTML/Markdown translation with a stubbed model
+"""
+
+import re
+
+import pytest
+
+HTML_SAMPLE = """<!DOCTYPE html>
+<html><head><title>Hello world</title><style>p { color: red; }</style></head>
+<body>
+  <!-- a comment -->
+  <p class="intro" title="Do not translate">Welcome to <a href="https://example.com/x?a=1&amp;b=2">our site</a>, friend.</p>
+  <p>Hello <b>world</b></p>
+  <p>Tom &amp; Jerry &lt;3 and a long paragraph
+     that wraps onto a second line <em>here</em>.</p>
+  <pre><code>print("hello")</code></pre>
+  <p>Visit https://example.com today, run <code>make</code></p>
+  <p>123</p>
+</body></html>"""
+
+HTML_UPPER = """<!DOCTYPE html>
+<html><head><title>HELLO WORLD</title><style>p { color: red; }</style></head>
+<body>
+  <!-- a comment -->
+  <p class="intro" title="Do not translate">WELCOME TO <a href="https://example.com/x?a=1&amp;b=2">OUR SITE</a>, FRIEND.</p>
+  <p>HELLO <b>WORLD</b></p>
+  <p>TOM &amp; JERRY &lt;3 AND A LONG PARAGRAPH
+     THAT WRAPS ONTO A SECOND LINE <em>HERE</em>.</p>
+  <pre><code>print("hello")</code></pre>
+  <p>VISIT https://example.com TODAY, RUN <code>make</code></p>
+  <p>123</p>
+</body></html>"""
+
+MARKDOWN_SAMPLE = """---
+title: My page
+---
+# Getting started
+
+Welcome to the **project**. See [the docs][docs] and [guide](https://example.com/g)
+for _details_ on `pip install x`, the
+third line.
+
+- [ ] Install the *package*
+- Read <https://example.com>
+  and continue here
+
+> Quoted text here
+
+```python
+print("not translated")
+```
+
+    indented code
+
+| Name | Value |
+|------|-------|
+| Speed | Fast |
+
+1. First step
+2. Second step ![logo alt](img.png) and snake_case_name
+
+[docs]: https://example.com/docs "Docs title"
+"""
+
+MARKDOWN_UPPER = """---
+title: My page
+---
+# GETTING STARTED
+
+WELCOME TO THE **PROJECT**. SEE [THE DOCS][docs] AND [GUIDE](https://example.com/g)
+FOR _DETAILS_ ON `pip install x`, THE
+THIRD LINE.
+
+- [ ] INSTALL THE *PACKAGE*
+- READ <https://example.com>
+  AND CONTINUE HERE
+
+> QUOTED TEXT HERE
+
+```python
+print("not translated")
+```
+
+    indented code
+
+| NAME | VALUE |
+|------|-------|
+| SPEED | FAST |
+
+1. FIRST STEP
+2. SECOND STEP ![LOGO ALT](img.png) AND SNAKE_CASE_NAME
+
+[docs]: https://example.com/docs "DOCS TITLE"
+"""
+
+
+def upper_outside_placeholders(text):
+    return re.sub(r'[^<>]+(?=<|$)', lambda m: m.group(0).upper(), text)
+
+
+@pytest.fixture
+def stub_model(translator, monkeypatch):
+    """Loaded-model globals plus a translate_batches stub; returns the list of batches it received"""
+    calls = []
+    monkeypatch.setattr(translator, 'model', object())
+    monkeypatch.setattr(translator, 'tokenizer', object())
+    monkeypatch.setattr(translator, 'lang_token_map', {'eng_Latn': 1, 'fra_Latn': 2})
+
+    def use(translate):
+        def translate_batches(texts, source_lang, target_lang):
+            calls.append(list(texts))
+            return [translate(text) for text in texts]
+        monkeypatch.setattr(translator, 'translate_batches', translate_batches)
+        return calls
+
+    return use
+
+
+@pytest.mark.parametrize("fmt, document", [('html', HTML_SAMPLE), ('markdown', MARKDOWN_SAMPLE)])
+def test_identity_round_trip(translator, stub_model, fmt, document):
+    stub_model(lambda text: text)
+    assert translator.translate_document(document, 'eng_Latn', 'fra_Latn', fmt) == document
+
+
+@pytest.mark.parametrize("fmt, document, expected", [
+    ('html', HTML_SAMPLE, HTML_UPPER),
+    ('markdown', MARKDOWN_SAMPLE, MARKDOWN_UPPER),
+])
+def test_only_text_nodes_change(translator, stub_model, fmt, document, expected):
+    stub_model(upper_outside_placeholders)
+    assert translator.translate_document(document, 'eng_Latn', 'fra_Latn', fmt) == expected
+
+
+@pytest.mark.parametrize("fmt, document, expected", [
+    ('html', HTML_SAMPLE, HTML_UPPER),
+    ('markdown', MARKDOWN_SAMPLE, MARKDOWN_UPPER),
+])
+def test_lost_placeholders_fall_back_to_runs(translator, stub_model, fmt, document, expected):
+    stub_model(lambda text: re.sub(r'<[^>]*>', '', text).upper())
+    assert translator.translate_document(document, 'eng_Latn', 'fra_Latn', fmt) == expected
+
+
+def test_inline_markup_stays_in_sentence(translator, stub_model):
+    calls = stub_model(lambda text: text)
+    translator.translate_document("<p>Hello <b>world</b></p>", 'eng_Latn', 'fra_Latn', 'html')
+    translator.translate_document("See [the docs][docs] and\n[guide](https://example.com).", 'eng_Latn', 'fra_Latn', 'markdown')
+    assert calls == [["Hello <t1>world</t1>"], ["See <t1>the docs</t1> and <t2>guide</t2>."]]
+
+
+def test_repeated_blocks_translated_once(translator, stub_model):
+    calls = stub_model(str.upper)
+    result = translator.translate_document("<li>Yes</li><li>No</li><li>Yes</li>", 'eng_Latn', 'fra_Latn', 'html')
+    assert result == "<li>YES</li><li>NO</li><li>YES</li>"
+    assert calls == [["Yes", "No"]]
+
+
+@pytest.mark.parametrize("fmt, document, expected", [
+    ('html', "<p title='a > b'>Hello world</p>", "<p title='a > b'>HELLO WORLD</p>"),
+    ('html', "<p>First line<br>second line</p>", "<p>FIRST LINE<br>SECOND LINE</p>"),
+    ('html', "<p>Icon  and <b>bold</b> text</p>", "<p>ICON  AND <b>BOLD</b> TEXT</p>"),
+    ('markdown', "| Name | Note |\n|---|---|\n| Pipe | Use `a | b` in table |",
+     "| NAME | NOTE |\n|---|---|\n| PIPE | USE `a | b` IN TABLE |"),
+    ('markdown', "---\n\nIntro text here.\n\n---\n", "---\n\nINTRO TEXT HERE.\n\n---\n"),
+])
+def test_markup_edge_cases(translator, stub_model, fmt, document, expected):
+    stub_model(upper_outside_placeholders)
+    assert translator.translate_document(document, 'eng_Latn', 'fra_Latn', fmt) == expected
+
+
+def test_prose_pipes_and_line_breaks_stay_in_sentence(translator, stub_model):
+    calls = stub_model(lambda text: text)
+    translator.translate_document("Answer Yes | No to continue.", 'eng_Latn', 'fra_Latn', 'markdown')
+    translator.translate_document("<p>First line<br>second line</p>", 'eng_Latn', 'fra_Latn', 'html')
+    assert calls == [["Answer Yes | No to continue."], ["First line<t1/>second line"]]
@@ -0,0 +1,178 @@
+"""
+Router mode tests: hash ring, spillover, failover and the stand-in backend
+"""
+
+import itertools
+import socket
+import urllib.error
+
+import pytest
+
+BACKENDS = ['http://127.0.0.1:5001', 'http://127.0.0.1:5002', 'http://127.0.0.1:5003']
+PAIRS = list(itertools.permutations(['eng_Latn', 'fra_Latn', 'deu_Latn', 'spa_Latn', 'arb_Arab', 'jpn_Jpan'], 2))
+
+
+@pytest.fixture
+def router(translator):
+    translator.build_router_ring(BACKENDS)
+    for backend in translator.router_backends:
+        backend["healthy"] = True
+    return translator
+
+
+def url_of(router, index):
+    return router.router_backends[index]["url"]
+
+
+def test_ring_order_is_stable(router):
+    orders = {pair: router.ring_order(*pair) for pair in PAIRS}
+
+    router.build_router_ring(BACKENDS)
+    assert {pair: router.ring_order(*pair) for pair in PAIRS} == orders
+    assert all(sorted(order) == [0, 1, 2] for order in orders.values())
+    # More than one backend owns pairs, so traffic is spread out
+    assert len({order[0] for order in orders.values()}) > 1
+
+
+def test_removing_a_backend_only_moves_its_own_pairs(router):
+    owners = {pair: url_of(router, router.ring_order(*pair)[0]) for pair in PAIRS}
+
+    router.build_router_ring(BACKENDS[:2])
+    for pair, owner in owners.items():
+        if owner != BACKENDS[2]:
+            assert url_of(router, router.ring_order(*pair)[0]) == owner
+
+
+def test_pick_backends_prefers_ring_owner(router):
+    assert router.pick_backends('eng_Latn', 'fra_Latn') == router.ring_order('eng_Latn', 'fra_Latn')
+
+
+def test_pick_backends_spills_over_from_busy_owner(router):
+    order = router.ring_order('eng_Latn', 'fra_Latn')
+    router.router_backends[order[0]]["inflight"] = router.ROUTER_SPILLOVER_INFLIGHT
+
+    assert router.pick_backends('eng_Latn', 'fra_Latn') == order[1:] + order[:1]
+
+
+def test_pick_backends_least_loaded_first_when_all_busy(router):
+    order = router.ring_order('eng_Latn', 'fra_Latn')
+    for load, index in zip((5, 3, 4), order):
+        router.router_backends[index]["inflight"] = load
+
+    assert router.pick_backends('eng_Latn', 'fra_Latn') == [order[1], order[2], order[0]]
+
+
+def test_pick_backends_skips_unhealthy(router):
+    order = router.ring_order('eng_Latn', 'fra_Latn')
+    router.router_backends[order[0]]["healthy"] = False
+
+    assert router.pick_backends('eng_Latn', 'fra_Latn') == order[1:]
+
+
+def fake_backends(monkeypatch, router, answers):
+    """Answer translate requests per backend URL; returns the URLs in the order they were called"""
+    called = []
+
+    def fetch_json(url, payload=None, timeout=None, headers=None):
+        backend = url.rsplit('/', 1)[0]
+        called.append(backend)
+        answer = answers[backend]
+        if isinstance(answer, Exception):
+            raise answer
+        status, data, response_headers = answer
+        return status, dict(data), response_headers
+
+    monkeypatch.setattr(router, 'fetch_json', fetch_json)
+    return called
+
+
+PAYLOAD = {'text': 'Hello', 'source_lang': 'eng_Latn', 'target_lang': 'fra_Latn'}
+
+
+def test_forward_translate_fails_over_on_connection_error(router, monkeypatch):
+    order = [url_of(router, i) for i in router.ring_order('eng_Latn', 'fra_Latn')]
+    called = fake_backends(monkeypatch, router, {
+        order[0]: urllib.error.URLError('connection refused'),
+        order[1]: (200, {'translation': 'Bonjour'}, {}),
+        order[2]: (200, {'translation': 'Bonjour'}, {}),
+    })
+
+    data, status, _ = router.forward_translate(PAYLOAD)
+
+    assert (status, data['backend']) == (200, order[1])
+    assert called == order[:2]
+    assert not router.router_backends[router.ring_order('eng_Latn', 'fra_Latn')[0]]["healthy"]
+
+
+def test_forward_translate_returns_request_errors_without_retrying(router, monkeypatch):
+    order = [url_of(router, i) for i in router.ring_order('eng_Latn', 'fra_Latn')]
+    called = fake_backends(monkeypatch, router, {url: (500, {'error': 'Empty translation'}, {}) for url in order})
+
+    data, status, _ = router.forward_translate(PAYLOAD)
+
+    assert (status, data['error']) == (500, 'Empty translation')
+    assert called == order[:1]
+    assert all(backend["healthy"] for backend in router.router_backends)
+
+
+def test_forward_translate_timeout_is_not_retried(router, monkeypatch):
+    order = [url_of(router, i) for i in router.ring_order('eng_Latn', 'fra_Latn')]
+    called = fake_backends(monkeypatch, router, {url: urllib.error.URLError(socket.timeout('timed out')) for url in order})
+
+    _, status, _ = router.forward_translate(PAYLOAD)
+
+    assert status == 504
+    assert called == order[:1]
+    assert all(backend["healthy"] for backend in router.router_backends)
+
+
+def test_forward_translate_all_backends_down(router, monkeypatch):
+    fake_backends(monkeypatch, router, {url: urllib.error.URLError('connection refused') for url in BACKENDS})
+
+    _, status, _ = router.forward_translate(PAYLOAD)
+
+    assert status == 502
+    assert router.forward_translate(PAYLOAD)[1] == 503
+
+
+def test_router_rejects_non_object_body(router):
+    client = router.router_app.test_client()
+    assert client.post('/translate', json=[1]).status_code == 400
+
+
+def test_stand_in_backend_echoes(translator):
+    client = translator.stand_in_app.test_client()
+
+    assert client.get('/model_status').get_json()["complete"] is True
+    response = client.post('/translate', json=PAYLOAD)
+    assert response.status_code == 200
+    assert response.get_json()["translation"] == 'Hello'
+    assert client.post('/translate', json={'text': ' '}).status_code == 400
+
+
+def test_forward_translate_tries_next_backend_when_shed(router, monkeypatch):
+    order = [url_of(router, i) for i in router.ring_order('eng_Latn', 'fra_Latn')]
+    called = fake_backends(monkeypatch, router, {
+        order[0]: (503, {'error': 'Server busy'}, {'Retry-After': '60'}),
+        order[1]: (200, {'translation': 'Bonjour'}, {}),
+        order[2]: (200, {'translation': 'Bonjour'}, {}),
+    })
+
+    data, status, _ = router.forward_translate(PAYLOAD)
+
+    assert (status, data['backend']) == (200, order[1])
+    assert called == order[:2]
+    assert all(backend["healthy"] for backend in router.router_backends)
+
+
+def test_forward_translate_all_shed_returns_shortest_retry_after(router, monkeypatch):
+    order = [url_of(router, i) for i in router.ring_order('eng_Latn', 'fra_Latn')]
+    called = fake_backends(monkeypatch, router, {
+        url: (503, {'error': 'Server busy'}, {'Retry-After': wait}) for url, wait in zip(order, ('60', '20', '45'))
+    })
+
+    data, status, retry_after = router.forward_translate(PAYLOAD)
+
+    assert (status, retry_after, data['backend']) == (503, '20', order[1])
+    assert called == order
+    assert all(backend["healthy"] for backend in router.router_backends)
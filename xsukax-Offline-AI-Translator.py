@@ -9,6 +9,18 @@ import json
 import threading
 import time
 import re
+import argparse
+import hashlib
+import bisect
+import urllib.request
+import urllib.error
+import queue
+import heapq
+import platform
+import socket
+import statistics
+from html import escape as html_escape, unescape as html_unescape
+from concurrent.futures import ThreadPoolExecutor
 from flask import Flask, render_template_string, request, jsonify
 from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
 import torch
@@ -29,9 +41,109 @@ app = Flask(__name__)
 model = None
 tokenizer = None
 selected_model_name = None
+selected_model_size = None
+model_dtype = torch.float32
 loading_status = {"loading": False, "progress": 0, "message": "", "complete": False}
 lang_token_map = {}
 
+# Markup-aware translation settings
+MARKUP_FORMATS = ("text", "html", "markdown")
+
+# Comments, CDATA, whole code-like elements and any other tag are kept verbatim;
+# a tag ends at the first > outside its quoted attribute values
+HTML_PROTECTED_RE = re.compile(
+    r'<!--.*?-->|<!\[CDATA\[.*?\]\]>'
+    r'|<(script|style|code|pre|textarea|kbd|samp)\b(?:[^>"\']|"[^"]*"|\'[^\']*\')*>.*?</\1\s*>'
+    r'|<(?:[^>"\']|"[^"]*"|\'[^\']*\')*>',
+    re.S | re.I
+)
+HTML_TAG_NAME_RE = re.compile(r'<\s*(/?)\s*([a-zA-Z][\w-]*)')
+# Inline elements stay inside the sentence as placeholders, any other tag ends a text block
+HTML_INLINE_TAGS = ('a', 'abbr', 'b', 'cite', 'em', 'i', 'mark', 'q', 's', 'small', 'span', 'strong', 'sub', 'sup', 'u')
+HTML_INLINE_ATOMS = ('br', 'code', 'kbd', 'samp', 'img', 'wbr')
+PLACEHOLDER_RE = re.compile(r'<\s*(/)?\s*t\s*(\d+)\s*(/)?\s*>', re.I)
+PRIVATE_USE_CHARS = range(0xE000, 0xF900)
+WORD_RE = re.compile(r'[^\W\d_]')
+URL_RE = re.compile(r'(?:https?|ftp)://\S+|www\.\S+|[\w.+-]+@[\w-]+\.[\w.-]+')
+MD_FENCE_RE = re.compile(r'^ {0,3}(`{3,}|~{3,})')
+MD_PREFIX_RE = re.compile(r'^[ \t]*(?:>[ \t]?)*[ \t]*(?:#{1,6}[ \t]+|[-*+][ \t]+(?:\[[ xX]\][ \t]+)?|\d+[.)][ \t]+)?')
+# Table delimiter row such as |---|:--:|, which makes the rows around it a table
+MD_TABLE_DELIMITER_RE = re.compile(r'^(?=.*\|)[ \t]*\|?[ \t]*:?-+:?[ \t]*(?:\|[ \t]*:?-+:?[ \t]*)*\|?[ \t]*$')
+# YAML front matter starts with --- followed by a key: value line
+MD_FRONT_MATTER_KEY_RE = re.compile(r'^[A-Za-z_][\w-]*:(?:[ \t]|$)')
+# Reference definition: label and URL stay as written, only the optional title is text
+MD_REFDEF_RE = re.compile(r'^( {0,3}\[[^\]]+\]:[ \t]*\S+[ \t]*)(?:(["\'(])(.*)(["\')][ \t]*))?$')
+# Backslash escapes, inline code, shortcut/collapsed reference links (the label must match its
+# definition), link/image brackets with their targets, autolinks, inline HTML, URLs and emphasis
+MD_PROTECTED_RE = re.compile(
+    r'\\[^\w\s]|`+[^`]*`+|!?\[[^\]\[]*\](?:\[\]|(?![(\[]))'
+    r'|!?\[|\]\([^)]*\)|\]\[[^\]]*\]|\]|<[^>]+>'
+    r'|(?:https?|ftp)://[^\s)]+|\*\*|\*|~~|(?<!\w)_+|_+(?!\w)'
+)
+
+# Startup auto-tuner settings
+AUTOTUNE_BATCH_SIZES = (1, 4, 8, 16)
+AUTOTUNE_LATENCY_FACTOR = 3
+AUTOTUNE_BF16_SPEEDUP = 1.15
+AUTOTUNE_REPEATS = 3
+AUTOTUNE_DTYPES = ("float32", "bfloat16")
+AUTOTUNE_SAMPLES = [
+    "The meeting has been moved to Thursday afternoon because several people are travelling.",
+    "Please make sure that all documents are signed before the end of the month.",
+    "The new library opens next week and offers free courses for children and adults.",
+    "Heavy rain is expected in the northern regions, so drivers should be careful.",
+    "Our team is working on a faster version of the application for older computers.",
+    "Thank you for your message, we will reply as soon as possible.",
+    "The museum collection includes paintings, sculptures and rare historical books.",
+    "Fresh vegetables from local farms are sold at the market every Saturday morning."
+]
+
+# Translation pipeline settings
+NUM_BEAMS = 5
+PIPELINE_BATCH_SIZE = 8
+PIPELINE_QUEUE_SIZE = 2
+PIPELINE_STAGES = ("tokenize", "generate", "detokenize")
+
+tokenizer_lock = threading.Lock()
+pipeline_lock = threading.Lock()
+pipeline_stats = {
+    "runs": 0,
+    "wall_seconds": 0.0,
+    "stages": {stage: {"busy_seconds": 0.0, "batches": 0, "segments": 0} for stage in PIPELINE_STAGES}
+}
+
+# Admission control settings
+CHARS_PER_TOKEN = 4
+REQUEST_SLO_SECONDS = 60
+CLIENT_BUDGET_CAPACITY = 50000.0
+CLIENT_BUDGET_REFILL = 1000.0
+CLIENT_WEIGHTS = {}
+API_KEYS = set()
+TRUSTED_PROXIES = set()
+SCHEDULER_SLOTS = 1
+CLIENT_PRUNE_INTERVAL = 60
+
+client_budgets = {}
+budget_lock = threading.Lock()
+scheduler_cond = threading.Condition()
+scheduler_queue = []
+scheduler_state = {"seq": 0, "running": 0, "running_cost": 0.0, "virtual_time": 0.0, "seconds_per_cost": None,
+                   "completed": 0, "rate_limited": 0, "shed": 0}
+client_finish_tags = {}
+last_client_prune = [0.0]
+
+# Router mode settings
+ROUTER_VIRTUAL_NODES = 64
+ROUTER_HEALTH_INTERVAL = 5
+ROUTER_HEALTH_TIMEOUT = 3
+ROUTER_REQUEST_TIMEOUT = 300
+ROUTER_SPILLOVER_INFLIGHT = 2
+
+router_backends = []
+router_ring = []
+router_ring_keys = []
+router_lock = threading.Lock()
+
 AVAILABLE_MODELS = {
     "1": {"name": "facebook/nllb-200-distilled-600M", "display": "NLLB-200-600M (Fast)", "desc": "Smallest, fastest", "size": 600},
     "2": {"name": "facebook/nllb-200-1.3B", "display": "NLLB-200-1.3B (Recommended)", "desc": "Best balance", "size": 1300},
@@ -93,22 +205,30 @@ LANGUAGES = {
     "slk_Latn": "Slovak"
 }
 
-def save_settings(model_choice):
+def read_settings():
+    try:
+        if os.path.exists(SETTINGS_FILE):
+            with open(SETTINGS_FILE, 'r') as f:
+                return json.load(f)
+    except:
+        pass
+    return {}
+
+def update_settings(values):
     try:
+        settings = read_settings()
+        settings.update(values)
         with open(SETTINGS_FILE, 'w') as f:
-            json.dump({'model_choice': model_choice}, f)
+            json.dump(settings, f, indent=2)
         return True
     except:
         return False
 
+def save_settings(model_choice):
+    return update_settings({'model_choice': model_choice})
+
 def load_settings():
-    try:
-        if os.path.exists(SETTINGS_FILE):
-            with open(SETTINGS_FILE, 'r') as f:
-                return json.load(f).get('model_choice')
-    except:
-        pass
-    return None
+    return read_settings().get('model_choice')
 
 def get_folder_size(folder_path):
     total = 0
@@ -153,7 +273,7 @@ def display_model_menu():
             sys.exit(0)
 
 def load_model_with_progress(model_name, display_name, expected_size_mb):
-    global model, tokenizer, selected_model_name, loading_status, lang_token_map
+    global model, tokenizer, selected_model_name, selected_model_size, loading_status, lang_token_map
     
     if model is not None:
         loading_status["complete"] = True
@@ -161,6 +281,7 @@ def load_model_with_progress(model_name, display_name, expected_size_mb):
         return
     
     selected_model_name = display_name
+    selected_model_size = expected_size_mb
     loading_status["loading"] = True
     loading_status["progress"] = 0
     loading_status["message"] = "Initializing..."
@@ -207,7 +328,7 @@ def load_model_with_progress(model_name, display_name, expected_size_mb):
         monitor_thread = threading.Thread(target=monitor_progress, daemon=True)
         monitor_thread.start()
         
-        model = AutoModelForSeq2SeqLM.from_pretrained(model_name, torch_dtype=torch.float32)
+        model = AutoModelForSeq2SeqLM.from_pretrained(model_name, torch_dtype=model_dtype)
         
         print("✓ Model loaded")
         
@@ -275,27 +396,133 @@ def split_by_newlines(text):
     
     return segments
 
-def translate_segment(segment, source_lang, target_lang):
-    """Translate a single segment"""
-    global model, tokenizer, lang_token_map
-    
-    if not segment.strip():
-        return segment
-    
-    tokenizer.src_lang = source_lang
-    inputs = tokenizer(segment, return_tensors="pt", padding=True, truncation=True, max_length=512)
-    target_token_id = lang_token_map[target_lang]
-    
+def record_stage(stage, started, segments):
+    with pipeline_lock:
+        stats = pipeline_stats["stages"][stage]
+        stats["busy_seconds"] += time.time() - started
+        stats["batches"] += 1
+        stats["segments"] += segments
+
+def get_pipeline_stats():
+    """Pipeline counters with per-stage utilization (busy time / pipeline wall time)"""
+    with pipeline_lock:
+        wall = pipeline_stats["wall_seconds"]
+        stages = {}
+        for stage, stats in pipeline_stats["stages"].items():
+            stages[stage] = {
+                "busy_seconds": round(stats["busy_seconds"], 3),
+                "batches": stats["batches"],
+                "segments": stats["segments"],
+                "utilization": round(stats["busy_seconds"] / wall, 3) if wall > 0 else 0.0
+            }
+        return {"runs": pipeline_stats["runs"], "wall_seconds": round(wall, 3), "stages": stages}
+
+def tokenize_batch(batch, source_lang):
+    """Encode a batch of segments with the fast tokenizer"""
+    with tokenizer_lock:
+        tokenizer.src_lang = source_lang
+        return tokenizer(batch, return_tensors="pt", padding=True, truncation=True, max_length=512)
+
+def generate_batch(inputs, target_lang):
     with torch.no_grad():
-        generated = model.generate(
+        return model.generate(
             **inputs,
-            forced_bos_token_id=target_token_id,
+            forced_bos_token_id=lang_token_map[target_lang],
             max_length=512,
-            num_beams=5,
+            num_beams=NUM_BEAMS,
             early_stopping=True
         )
+
+def decode_batch(generated):
+    with tokenizer_lock:
+        return [t.strip() for t in tokenizer.batch_decode(generated, skip_special_tokens=True)]
+
+def translate_batches(segments, source_lang, target_lang):
+    """Translate a list of non-empty segments, returned in the same order.
+    
+    Segments are grouped into length-sorted batches and pushed through three
+    stages connected by bounded queues: tokenization and detokenization run
+    in a thread pool while the calling thread keeps the model generating.
+    """
+    order = sorted(range(len(segments)), key=lambda i: len(segments[i]))
+    batches = [order[i:i + PIPELINE_BATCH_SIZE] for i in range(0, len(order), PIPELINE_BATCH_SIZE)]
+    results = [None] * len(segments)
+    
+    encoded = queue.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+    generated = queue.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+    abort = threading.Event()
+    errors = []
+    
+    def put(q, item):
+        while not abort.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+    
+    def get(q):
+        while not abort.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        return None
     
-    return tokenizer.batch_decode(generated, skip_special_tokens=True)[0].strip()
+    def run_stage(stage):
+        try:
+            stage()
+        except Exception as e:
+            errors.append(e)
+            abort.set()
+    
+    def tokenize_stage():
+        for batch in batches:
+            if abort.is_set():
+                return
+            started = time.time()
+            inputs = tokenize_batch([segments[i] for i in batch], source_lang)
+            record_stage("tokenize", started, len(batch))
+            put(encoded, (batch, inputs))
+        put(encoded, None)
+    
+    def generate_stage():
+        while True:
+            item = get(encoded)
+            if item is None:
+                break
+            batch, inputs = item
+            started = time.time()
+            output = generate_batch(inputs, target_lang)
+            record_stage("generate", started, len(batch))
+            put(generated, (batch, output))
+        put(generated, None)
+    
+    def detokenize_stage():
+        while True:
+            item = get(generated)
+            if item is None:
+                break
+            batch, output = item
+            started = time.time()
+            for i, text in zip(batch, decode_batch(output)):
+                results[i] = text
+            record_stage("detokenize", started, len(batch))
+    
+    started = time.time()
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        executor.submit(run_stage, tokenize_stage)
+        executor.submit(run_stage, detokenize_stage)
+        run_stage(generate_stage)
+    
+    with pipeline_lock:
+        pipeline_stats["runs"] += 1
+        pipeline_stats["wall_seconds"] += time.time() - started
+    
+    if errors:
+        raise errors[0]
+    
+    return results
 
 def translate_text(text, source_lang, target_lang):
     """Translate text while preserving newline structure"""
@@ -322,15 +549,14 @@ def translate_text(text, source_lang, target_lang):
         segments = split_by_newlines(text)
         print(f"Segments: {len(segments)}")
         
-        # Translate each segment
-        translated_segments = []
-        for i, segment in enumerate(segments):
-            if segment.strip():
-                translated = translate_segment(segment, source_lang, target_lang)
-                translated_segments.append(translated)
-                print(f"  Segment {i+1}/{len(segments)}: {len(segment)} -> {len(translated)} chars")
-            else:
-                translated_segments.append('')
+        # Translate all non-empty segments through the batch pipeline
+        indexes = [i for i, segment in enumerate(segments) if segment.strip()]
+        translations = translate_batches([segments[i] for i in indexes], source_lang, target_lang)
+        
+        translated_segments = [''] * len(segments)
+        for i, translated in zip(indexes, translations):
+            translated_segments[i] = translated
+            print(f"  Segment {i+1}/{len(segments)}: {len(segments[i])} -> {len(translated)} chars")
         
         # Reconstruct with newlines
         result = '\n'.join(translated_segments)
@@ -348,6 +574,737 @@ def translate_text(text, source_lang, target_lang):
         print(f"{'='*50}\n")
         raise
 
+def split_protected(text, pattern):
+    """Split text into (piece, translatable) pairs around matches of pattern"""
+    pieces = []
+    pos = 0
+    
+    for match in pattern.finditer(text):
+        if match.start() > pos:
+            pieces.append((text[pos:match.start()], True))
+        pieces.append((match.group(0), False))
+        pos = match.end()
+    
+    if pos < len(text):
+        pieces.append((text[pos:], True))
+    
+    return pieces
+
+def text_item(raw, unescape=None):
+    return {"kind": "text", "raw": raw, "text": unescape(raw) if unescape else raw}
+
+def markup_item(kind, raw, name=None):
+    return {"kind": kind, "raw": raw, "name": name}
+
+def is_blank(item):
+    return item["kind"] == 'newline' or (item["kind"] == 'text' and not item["raw"].strip(' \t\r\n'))
+
+def add_text_items(block, raw, unescape=None):
+    """Append text to a block, with line breaks as their own items and URLs kept as markup"""
+    for number, part in enumerate(re.split(r'(\n[ \t]*)', raw)):
+        if number % 2:
+            block.append(markup_item('newline', part))
+        elif part:
+            for piece, translatable in split_protected(part, URL_RE):
+                block.append(text_item(piece, unescape) if translatable else markup_item('atom', piece))
+
+def pair_markup(items):
+    """Match opening and closing inline markup and number it; unmatched markup becomes an atom"""
+    stack = []
+    
+    for index, item in enumerate(items):
+        if item["kind"] == 'toggle':
+            matches = stack and items[stack[-1]]["name"] == item["name"]
+            item["kind"] = 'close' if matches else 'open'
+        
+        if item["kind"] == 'open':
+            stack.append(index)
+        elif item["kind"] == 'close':
+            if stack and items[stack[-1]]["name"] == item["name"]:
+                item["pair"] = stack.pop()
+            else:
+                item["kind"] = 'atom'
+    
+    for index in stack:
+        items[index]["kind"] = 'atom'
+    
+    number = 0
+    for item in items:
+        if item["kind"] in ('open', 'atom'):
+            number += 1
+            item["id"] = number
+        elif item["kind"] == 'close':
+            item["id"] = items[item["pair"]]["id"]
+
+def flush_block(pieces, block):
+    """Move a finished block into pieces; its outer whitespace, and blocks without words, stay raw"""
+    items = list(block)
+    block.clear()
+    
+    leading = ''
+    trailing = ''
+    while items and is_blank(items[0]):
+        leading += items.pop(0)["raw"]
+    while items and is_blank(items[-1]):
+        trailing = items.pop()["raw"] + trailing
+    
+    if items and items[0]["kind"] == 'text':
+        raw = items[0]["raw"].lstrip(' \t\r\n')
+        leading += items[0]["raw"][:len(items[0]["raw"]) - len(raw)]
+        items[0] = dict(items[0], raw=raw, text=items[0]["text"].lstrip(' \t\r\n'))
+    if items and items[-1]["kind"] == 'text':
+        raw = items[-1]["raw"].rstrip(' \t\r\n')
+        trailing = items[-1]["raw"][len(raw):] + trailing
+        items[-1] = dict(items[-1], raw=raw, text=items[-1]["text"].rstrip(' \t\r\n'))
+    
+    if leading:
+        pieces.append(leading)
+    
+    if any(item["kind"] == 'text' and WORD_RE.search(item["text"]) for item in items):
+        pair_markup(items)
+        pieces.append(items)
+    else:
+        pieces.extend(item["raw"] for item in items)
+    
+    if trailing:
+        pieces.append(trailing)
+
+def split_html(document):
+    """Split HTML into raw markup and blocks of text together with their inline elements"""
+    pieces = []
+    block = []
+    pos = 0
+    
+    for match in HTML_PROTECTED_RE.finditer(document):
+        add_text_items(block, document[pos:match.start()], html_unescape)
+        
+        tag = match.group(0)
+        name_match = HTML_TAG_NAME_RE.match(tag)
+        name = name_match.group(2).lower() if name_match else None
+        
+        if name in HTML_INLINE_TAGS and not tag.endswith('/>'):
+            block.append(markup_item('close' if name_match.group(1) else 'open', tag, name))
+        elif name in HTML_INLINE_TAGS or name in HTML_INLINE_ATOMS:
+            block.append(markup_item('atom', tag))
+        else:
+            flush_block(pieces, block)
+            pieces.append(tag)
+        
+        pos = match.end()
+    
+    add_text_items(block, document[pos:], html_unescape)
+    flush_block(pieces, block)
+    
+    return pieces
+
+def add_markdown_items(block, content):
+    for token, translatable in split_protected(content, MD_PROTECTED_RE):
+        if translatable:
+            block.append(text_item(token))
+        elif token in ('[', '!['):
+            block.append(markup_item('open', token, '['))
+        elif token.startswith(']'):
+            block.append(markup_item('close', token, '['))
+        elif token[0] in '*_~':
+            block.append(markup_item('toggle', token, token))
+        else:
+            block.append(markup_item('atom', token))
+
+def split_table_row(content):
+    """Split a table row into cells at pipes outside code spans, links and other protected Markdown"""
+    cells = ['']
+    for piece, translatable in split_protected(content, MD_PROTECTED_RE):
+        if translatable:
+            first, *rest = piece.split('|')
+            cells[-1] += first
+            cells.extend(rest)
+        else:
+            cells[-1] += piece
+    return cells
+
+def find_table_lines(lines):
+    """Line numbers of table rows: a header row above a delimiter row, and the rows below it up to a blank line"""
+    table_lines = set()
+    
+    for number in range(1, len(lines)):
+        if MD_TABLE_DELIMITER_RE.match(lines[number]) and len(split_table_row(lines[number - 1])) > 1:
+            table_lines.update((number - 1, number))
+            row = number + 1
+            while row < len(lines) and lines[row].strip() and len(split_table_row(lines[row])) > 1:
+                table_lines.add(row)
+                row += 1
+    
+    return table_lines
+
+def split_markdown(document):
+    """Split Markdown into raw syntax and blocks of text together with their inline markup.
+    
+    Soft-wrapped lines of a paragraph, list item or quote form one block.
+    Code, front matter, reference labels and table pipes stay raw.
+    """
+    pieces = []
+    block = []
+    fence = None
+    previous = 'blank'
+    previous_depth = 0
+    lines = document.split('\n')
+    table_lines = find_table_lines(lines)
+    
+    # YAML front matter: a leading block between two --- lines, opening with a key: value line
+    front_matter_end = -1
+    if lines[0].strip() == '---' and len(lines) > 1 and MD_FRONT_MATTER_KEY_RE.match(lines[1]):
+        for number in range(1, len(lines)):
+            if lines[number].strip() in ('---', '...'):
+                front_matter_end = number
+                break
+    
+    for number, line in enumerate(lines):
+        newline = '\n' if number else ''
+        
+        if number <= front_matter_end:
+            flush_block(pieces, block)
+            pieces.append(newline + line)
+            continue
+        
+        fence_match = MD_FENCE_RE.match(line)
+        if fence is not None or fence_match:
+            if fence is None:
+                fence = fence_match.group(1)
+            elif fence_match and fence_match.group(1)[0] == fence[0] and len(fence_match.group(1)) >= len(fence):
+                # Closing fence of the same kind
+                fence = None
+            flush_block(pieces, block)
+            pieces.append(newline + line)
+            previous = 'blank'
+            continue
+        
+        is_code = line.startswith(('    ', '\t')) and previous in ('blank', 'code')
+        if is_code or not WORD_RE.search(line):
+            # Code, blank lines and lines without words such as rules or setext underlines
+            flush_block(pieces, block)
+            pieces.append(newline + line)
+            previous = 'code' if is_code and line.strip() else 'blank' if not line.strip() else 'rule'
+            continue
+        
+        refdef = MD_REFDEF_RE.match(line)
+        if refdef:
+            flush_block(pieces, block)
+            pieces.append(newline + refdef.group(1))
+            if refdef.group(2):
+                pieces.append(refdef.group(2))
+                add_markdown_items(block, refdef.group(3))
+                flush_block(pieces, block)
+                pieces.append(refdef.group(4))
+            previous = 'rule'
+            continue
+        
+        prefix = MD_PREFIX_RE.match(line).group(0)
+        content = line[len(prefix):]
+        depth = prefix.count('>')
+        marker = prefix.strip(' \t>')
+        is_table = number in table_lines
+        
+        if previous == 'text' and not marker and not is_table and depth == previous_depth:
+            block.append(markup_item('newline', newline + prefix))
+        else:
+            flush_block(pieces, block)
+            pieces.append(newline + prefix)
+        
+        if is_table:
+            for cell_number, cell in enumerate(split_table_row(content)):
+                if cell_number:
+                    flush_block(pieces, block)
+                    pieces.append('|')
+                add_markdown_items(block, cell)
+            flush_block(pieces, block)
+        else:
+            add_markdown_items(block, content)
+        
+        hard_break = line.endswith(('  ', '\\'))
+        previous = 'rule' if marker.startswith('#') or is_table or hard_break else 'text'
+        previous_depth = depth
+    
+    flush_block(pieces, block)
+    
+    return pieces
+
+def block_source(items):
+    """Model input for a block, with inline markup replaced by numbered placeholder tags"""
+    parts = []
+    
+    for item in items:
+        if item["kind"] == 'text':
+            parts.append(item["text"])
+        elif item["kind"] == 'newline':
+            parts.append(' ')
+        elif item["kind"] == 'open':
+            parts.append(f"<t{item['id']}>")
+        elif item["kind"] == 'close':
+            parts.append(f"</t{item['id']}>")
+        else:
+            parts.append(f"<t{item['id']}/>")
+    
+    return ' '.join(''.join(parts).split())
+
+def restore_placeholders(items, translated):
+    """Split a translation into (text, markup) parts, None unless every placeholder came back once and nested"""
+    markup = {(item["kind"], item["id"]): item["raw"] for item in items if item["kind"] in ('open', 'close', 'atom')}
+    parts = []
+    seen = set()
+    stack = []
+    pos = 0
+    
+    for match in PLACEHOLDER_RE.finditer(translated):
+        key = ('close' if match.group(1) else 'atom' if match.group(3) else 'open', int(match.group(2)))
+        if key not in markup or key in seen:
+            return None
+        seen.add(key)
+        
+        if key[0] == 'open':
+            stack.append(key[1])
+        elif key[0] == 'close' and (not stack or stack.pop() != key[1]):
+            return None
+        
+        parts.append((translated[pos:match.start()], None))
+        parts.append(('', markup[key]))
+        pos = match.end()
+    
+    parts.append((translated[pos:], None))
+    
+    if stack or len(seen) != len(markup):
+        return None
+    return parts
+
+def layout_block(items, parts, escape=None):
+    """Join restored parts, wrapped over the same lines (and line prefixes) as the original block"""
+    # One private-use character per markup so it is never split across lines,
+    # picked from those not already in the text so the text's own are kept
+    used = set(''.join(text for text, raw in parts if raw is None))
+    free = (chr(code) for code in PRIVATE_USE_CHARS if chr(code) not in used)
+    markup = {}
+    chunks = []
+    for text, raw in parts:
+        if raw is None:
+            chunks.append(escape(text) if escape else text)
+        else:
+            sentinel = next(free)
+            chunks.append(sentinel)
+            markup[sentinel] = raw
+    
+    widths = [0]
+    breaks = []
+    for item in items:
+        if item["kind"] == 'newline':
+            breaks.append(item["raw"])
+            widths.append(0)
+        else:
+            widths[-1] += len(item["raw"])
+    
+    def width(word):
+        return sum(len(markup[c]) if c in markup else 1 for c in word)
+    
+    lines = [[]]
+    used = 0
+    for word in ''.join(chunks).split():
+        word_width = width(word)
+        if lines[-1] and len(lines) <= len(breaks) and used + 1 + word_width > widths[len(lines) - 1]:
+            lines.append([])
+            used = 0
+        used += word_width + (1 if lines[-1] else 0)
+        lines[-1].append(word)
+    
+    text = ' '.join(lines[0]) + ''.join(br + ' '.join(line) for br, line in zip(breaks, lines[1:]))
+    return text.translate({ord(sentinel): raw for sentinel, raw in markup.items()})
+
+def fragment_text(item):
+    return ' '.join(item["text"].split())
+
+def layout_fragments(items, translations, escape=None):
+    """Fallback layout: each text run translated on its own, markup left where it was"""
+    result = []
+    
+    for item in items:
+        if item["kind"] == 'text' and WORD_RE.search(item["text"]):
+            raw = item["raw"]
+            leading = raw[:len(raw) - len(raw.lstrip())]
+            trailing = raw[len(raw.rstrip()):]
+            translated = translations[fragment_text(item)]
+            result.append(leading + (escape(translated) if escape else translated) + trailing)
+        else:
+            result.append(item["raw"])
+    
+    return ''.join(result)
+
+def translate_unique(texts, source_lang, target_lang):
+    unique = list(dict.fromkeys(texts))
+    if not unique:
+        return {}
+    return dict(zip(unique, translate_batches(unique, source_lang, target_lang)))
+
+def translate_blocks(pieces, source_lang, target_lang, escape=None):
+    """Translate every text block as one sentence with placeholders for its inline markup.
+    
+    Identical blocks are translated once, all in one batch. Blocks whose
+    placeholders did not survive the model are translated again run by run.
+    """
+    blocks = [piece for piece in pieces if isinstance(piece, list)]
+    sources = [block_source(block) for block in blocks]
+    translations = translate_unique(sources, source_lang, target_lang)
+    print(f"Text blocks: {len(blocks)} ({len(translations)} unique)")
+    
+    restored = {}
+    for index, (block, source) in enumerate(zip(blocks, sources)):
+        if translations[source] == source:
+            # Unchanged (names, numbers...): keep the original bytes and layout
+            restored[index] = ''.join(item["raw"] for item in block)
+            continue
+        parts = restore_placeholders(block, translations[source])
+        if parts is not None:
+            restored[index] = layout_block(block, parts, escape)
+    
+    fragments = {}
+    failed = [block for index, block in enumerate(blocks) if index not in restored]
+    if failed:
+        print(f"  Placeholders lost in {len(failed)} blocks, translating their runs separately")
+        texts = [fragment_text(item) for block in failed for item in block
+                 if item["kind"] == 'text' and WORD_RE.search(item["text"])]
+        fragments = translate_unique(texts, source_lang, target_lang)
+    
+    result = []
+    index = 0
+    for piece in pieces:
+        if isinstance(piece, list):
+            result.append(restored[index] if index in restored else layout_fragments(piece, fragments, escape))
+            index += 1
+        else:
+            result.append(piece)
+    
+    return ''.join(result)
+
+def translate_document(text, source_lang, target_lang, fmt='text'):
+    """Translate plain text, or only the text nodes of an HTML/Markdown document"""
+    if fmt == 'text':
+        return translate_text(text, source_lang, target_lang)
+    
+    if model is None or tokenizer is None:
+        raise Exception("Model not loaded")
+    
+    if source_lang not in lang_token_map:
+        raise Exception(f"Source language not supported: {source_lang}")
+    
+    if target_lang not in lang_token_map:
+        raise Exception(f"Target language not supported: {target_lang}")
+    
+    print(f"\n{'='*50}")
+    print(f"TRANSLATION ({fmt.upper()})")
+    print(f"{'='*50}")
+    print(f"From: {LANGUAGES.get(source_lang, source_lang)}")
+    print(f"To: {LANGUAGES.get(target_lang, target_lang)}")
+    print(f"Text length: {len(text)} chars")
+    
+    if fmt == 'html':
+        result = translate_blocks(split_html(text), source_lang, target_lang,
+                                  lambda t: html_escape(t, quote=False))
+    else:
+        result = translate_blocks(split_markdown(text), source_lang, target_lang)
+    
+    print(f"✓ Translation complete ({len(result)} chars)")
+    print(f"{'='*50}\n")
+    
+    return result
+
+# ============================================================
+# Startup auto-tuner
+# ============================================================
+
+def get_total_memory():
+    try:
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES')
+    except (AttributeError, ValueError, OSError):
+        return None
+
+def cpu_fingerprint():
+    """Short hash identifying the host CPU, memory and torch build"""
+    cpu_name = platform.processor()
+    try:
+        with open('/proc/cpuinfo', 'r') as f:
+            for line in f:
+                if line.startswith('model name'):
+                    cpu_name = line.split(':', 1)[1].strip()
+                    break
+    except OSError:
+        pass
+    
+    memory_gb = round((get_total_memory() or 0) / 1024**3)
+    description = f"{platform.system()}|{platform.machine()}|{cpu_name}|{os.cpu_count()}|{memory_gb}|{torch.__version__}"
+    return hashlib.sha1(description.encode('utf-8')).hexdigest()[:12]
+
+def tuning_key(model_name):
+    return f"{model_name}|{cpu_fingerprint()}"
+
+def load_tuning(model_name):
+    return read_settings().get('autotune', {}).get(tuning_key(model_name))
+
+def save_tuning(model_name, tuning):
+    saved = read_settings().get('autotune', {})
+    saved[tuning_key(model_name)] = tuning
+    return update_settings({'autotune': saved})
+
+def check_tuning(tuning):
+    """Return why a saved tuning entry cannot be applied, or None if it is usable"""
+    if not isinstance(tuning, dict):
+        return "not an object"
+    for key in ('threads', 'interop_threads', 'batch_size'):
+        value = tuning.get(key)
+        if not isinstance(value, int) or isinstance(value, bool) or value < 1:
+            return f"'{key}' must be a positive integer"
+    if tuning.get('dtype') not in AUTOTUNE_DTYPES:
+        return f"'dtype' must be one of: {', '.join(AUTOTUNE_DTYPES)}"
+    return None
+
+def apply_tuning(tuning):
+    """Apply threads, batch size and dtype; call before load_model so the dtype is used for loading"""
+    global PIPELINE_BATCH_SIZE, model_dtype
+    
+    torch.set_num_threads(tuning['threads'])
+    try:
+        torch.set_interop_threads(tuning['interop_threads'])
+    except RuntimeError:
+        # Only settable once, before any inter-op work has started
+        pass
+    
+    PIPELINE_BATCH_SIZE = tuning['batch_size']
+    model_dtype = getattr(torch, tuning['dtype'])
+    
+    print(f"Tuning: {tuning['threads']} threads, batch {tuning['batch_size']}, {tuning['dtype']}")
+
+def measure_config(batch_size):
+    """Translate one synthetic batch AUTOTUNE_REPEATS times, returns (segments per second, median batch latency)"""
+    batch = (AUTOTUNE_SAMPLES * batch_size)[:batch_size]
+    
+    # Warm-up pass so one-off allocations are not measured
+    generate_batch(tokenize_batch(batch[:1], 'eng_Latn'), 'fra_Latn')
+    
+    latencies = []
+    for _ in range(AUTOTUNE_REPEATS):
+        started = time.time()
+        decode_batch(generate_batch(tokenize_batch(batch, 'eng_Latn'), 'fra_Latn'))
+        latencies.append(time.time() - started)
+    latency = statistics.median(latencies)
+    
+    return batch_size / latency, latency
+
+def sweep_batch_sizes(threads, dtype_name, batch_sizes, results):
+    """Measure batch sizes in increasing order, stopping once latency exceeds what pick_best would allow"""
+    torch.set_num_threads(threads)
+    
+    single_latency = None
+    for batch_size in sorted(batch_sizes):
+        throughput, latency = measure_config(batch_size)
+        results.append({"threads": threads, "batch_size": batch_size, "dtype": dtype_name,
+                        "throughput": round(throughput, 3), "latency": round(latency, 3)})
+        print(f"  {threads:>3} threads  batch {batch_size:>2}  {dtype_name:<8}  "
+              f"{throughput:6.2f} seg/s  {latency:6.2f}s")
+        
+        if single_latency is None:
+            single_latency = latency
+        elif latency > single_latency * AUTOTUNE_LATENCY_FACTOR:
+            # Larger batches only take longer, and this one is already over the limit
+            break
+
+def pick_best(results):
+    """Highest throughput whose batch latency stays within AUTOTUNE_LATENCY_FACTOR x the fastest single segment"""
+    fastest = min(r["latency"] for r in results if r["batch_size"] == 1)
+    allowed = [r for r in results if r["latency"] <= fastest * AUTOTUNE_LATENCY_FACTOR]
+    return max(allowed, key=lambda r: r["throughput"])
+
+def autotune_model(model_name):
+    """Sweep threads, batch size and precision on synthetic input, apply and save the best"""
+    global model
+    
+    print("\n" + "="*60)
+    print("AUTO-TUNING")
+    print("="*60)
+    
+    cores = os.cpu_count() or 1
+    memory = get_total_memory()
+    # Beam search activations grow with the batch, keep big batches for hosts with room
+    batch_sizes = [b for b in AUTOTUNE_BATCH_SIZES if b <= 8 or (memory or 0) >= 16 * 1024**3]
+    
+    thread_options = sorted({cores, max(1, cores // 2), max(1, cores // 4)}, reverse=True)
+    interop_threads = min(2, cores)
+    try:
+        torch.set_interop_threads(interop_threads)
+    except RuntimeError:
+        interop_threads = torch.get_num_interop_threads()
+    
+    results = []
+    for threads in thread_options:
+        sweep_batch_sizes(threads, 'float32', batch_sizes, results)
+    best = pick_best(results)
+    
+    # bfloat16 halves memory but costs some accuracy, so only keep it for a clear speedup
+    try:
+        model = model.to(torch.bfloat16)
+        bf16_results = []
+        sweep_batch_sizes(best["threads"], 'bfloat16', batch_sizes, bf16_results)
+        best_bf16 = pick_best(results + bf16_results)
+        if best_bf16["dtype"] == 'bfloat16' and best_bf16["throughput"] >= best["throughput"] * AUTOTUNE_BF16_SPEEDUP:
+            best = best_bf16
+    except Exception as e:
+        print(f"  bfloat16 not usable: {e}")
+    
+    if best["dtype"] != 'bfloat16':
+        # Casting back would keep the bfloat16 rounding, so reload the float32 weights
+        model = AutoModelForSeq2SeqLM.from_pretrained(model_name, torch_dtype=torch.float32)
+    
+    tuning = dict(best, interop_threads=interop_threads, cores=cores,
+                  memory_gb=round((memory or 0) / 1024**3, 1))
+    apply_tuning(tuning)
+    
+    if save_tuning(model_name, tuning):
+        print(f"✓ Saved to {SETTINGS_FILE}")
+    
+    return tuning
+
+# ============================================================
+# Admission control and per-client fair scheduling
+# ============================================================
+
+def get_client_id():
+    """A configured API key if one was sent, otherwise the client IP"""
+    api_key = request.headers.get('X-API-Key', '').strip()
+    if api_key and api_key in API_KEYS:
+        return f"key:{api_key}"
+    
+    addr = request.remote_addr or 'unknown'
+    if addr in TRUSTED_PROXIES:
+        # Entries left of the last trusted hop are written by the client, so walk from the right
+        forwarded = [entry.strip() for entry in request.headers.get('X-Forwarded-For', '').split(',') if entry.strip()]
+        for entry in reversed(forwarded):
+            addr = entry
+            if entry not in TRUSTED_PROXIES:
+                break
+    return f"ip:{addr}"
+
+def estimate_cost(text):
+    """Rough compute cost of a request: tokens x beam width x model size (billions of parameters)"""
+    tokens = max(1, len(text) // CHARS_PER_TOKEN)
+    return tokens * NUM_BEAMS * (selected_model_size or 1000) / 1000
+
+def take_budget(client, cost):
+    """Charge a client's token bucket, returns (allowed, seconds until enough budget)"""
+    # A single request larger than the bucket is let through once the bucket is full
+    cost = min(cost, CLIENT_BUDGET_CAPACITY)
+    now = time.time()
+    
+    if now - last_client_prune[0] >= CLIENT_PRUNE_INTERVAL:
+        last_client_prune[0] = now
+        prune_clients(now)
+    
+    with budget_lock:
+        bucket = client_budgets.setdefault(client, {"tokens": CLIENT_BUDGET_CAPACITY, "updated": now})
+        bucket["tokens"] = min(CLIENT_BUDGET_CAPACITY, bucket["tokens"] + (now - bucket["updated"]) * CLIENT_BUDGET_REFILL)
+        bucket["updated"] = now
+        
+        if bucket["tokens"] >= cost:
+            bucket["tokens"] -= cost
+            return True, 0
+        
+        return False, (cost - bucket["tokens"]) / CLIENT_BUDGET_REFILL
+
+def prune_clients(now):
+    """Forget clients whose state is the same as a new client's: full buckets and finish tags behind virtual time"""
+    with budget_lock:
+        for client in list(client_budgets):
+            bucket = client_budgets[client]
+            if bucket["tokens"] + (now - bucket["updated"]) * CLIENT_BUDGET_REFILL >= CLIENT_BUDGET_CAPACITY:
+                del client_budgets[client]
+    
+    with scheduler_cond:
+        for client in list(client_finish_tags):
+            if client_finish_tags[client] <= scheduler_state["virtual_time"]:
+                del client_finish_tags[client]
+
+def refund_budget(client, cost):
+    with budget_lock:
+        if client in client_budgets:
+            bucket = client_budgets[client]
+            bucket["tokens"] = min(CLIENT_BUDGET_CAPACITY, bucket["tokens"] + min(cost, CLIENT_BUDGET_CAPACITY))
+
+def estimated_wait(finish_tag):
+    """Seconds until a job with this finish tag would be done (scheduler_cond must be held)"""
+    ahead = scheduler_state["running_cost"] / SCHEDULER_SLOTS
+    ahead += sum(job["cost"] for tag, _, job in scheduler_queue if tag < finish_tag) / SCHEDULER_SLOTS
+    return ahead * scheduler_state["seconds_per_cost"]
+
+def acquire_slot(client, cost, deadline):
+    """Wait for a compute slot under weighted fair queuing.
+    
+    Each client gets a virtual finish tag advancing by cost / weight, and
+    free slots go to the smallest tag, so a client sending large documents
+    in a loop only delays itself. Returns the job, or None when the request
+    was shed because it cannot finish before its deadline. Shedding starts
+    once the first completed request has calibrated seconds per cost unit.
+    """
+    with scheduler_cond:
+        weight = CLIENT_WEIGHTS.get(client, 1.0)
+        start_tag = max(scheduler_state["virtual_time"], client_finish_tags.get(client, 0.0))
+        finish_tag = start_tag + cost / weight
+        
+        if scheduler_state["seconds_per_cost"] is not None:
+            if time.time() + estimated_wait(finish_tag) + cost * scheduler_state["seconds_per_cost"] > deadline:
+                scheduler_state["shed"] += 1
+                return None
+        
+        client_finish_tags[client] = finish_tag
+        scheduler_state["seq"] += 1
+        job = {"client": client, "cost": cost, "start_tag": start_tag, "deadline": deadline}
+        heapq.heappush(scheduler_queue, (finish_tag, scheduler_state["seq"], job))
+        
+        while scheduler_queue[0][2] is not job or scheduler_state["running"] >= SCHEDULER_SLOTS:
+            scheduler_cond.wait()
+        
+        heapq.heappop(scheduler_queue)
+        scheduler_cond.notify_all()
+        
+        # Re-check at dispatch: later arrivals with smaller tags may have pushed us back
+        if scheduler_state["seconds_per_cost"] is not None:
+            if time.time() + cost * scheduler_state["seconds_per_cost"] > deadline:
+                # Take back the virtual time this job claimed, so the client is not charged for work never done
+                client_finish_tags[client] = max(start_tag, client_finish_tags.get(client, finish_tag) - cost / weight)
+                scheduler_state["shed"] += 1
+                return None
+        
+        scheduler_state["running"] += 1
+        scheduler_state["running_cost"] += cost
+        scheduler_state["virtual_time"] = max(scheduler_state["virtual_time"], start_tag)
+        job["started"] = time.time()
+        return job
+
+def release_slot(job, succeeded=True):
+    """Free the job's slot; only successful translations calibrate seconds per cost unit"""
+    elapsed = time.time() - job["started"]
+    
+    with scheduler_cond:
+        if succeeded:
+            rate = elapsed / job["cost"]
+            previous = scheduler_state["seconds_per_cost"]
+            scheduler_state["seconds_per_cost"] = rate if previous is None else 0.8 * previous + 0.2 * rate
+        scheduler_state["running"] -= 1
+        scheduler_state["running_cost"] -= job["cost"]
+        scheduler_state["completed"] += 1
+        scheduler_cond.notify_all()
+
+def get_scheduler_stats():
+    with scheduler_cond:
+        stats = {key: value for key, value in scheduler_state.items() if key != "seq"}
+        stats["queued"] = len(scheduler_queue)
+        stats["queued_cost"] = sum(job["cost"] for _, _, job in scheduler_queue)
+    with budget_lock:
+        stats["clients"] = len(client_budgets)
+    return stats
+
 HTML_TEMPLATE = """
 <!DOCTYPE html>
 <html lang="en">
@@ -671,17 +1628,20 @@ HTML_TEMPLATE = """
 </html>
 """
 
-@app.route('/')
-def index():
+def render_index(model_label):
     options = [f'<option value="{code}" {"selected" if code == "eng_Latn" else ""}>{name}</option>' 
                for code, name in sorted(LANGUAGES.items(), key=lambda x: x[1])]
     
     html = HTML_TEMPLATE.replace('{{ language_options }}', '\n'.join(options))
-    html = html.replace('{{ model_name }}', f"Using: {selected_model_name}" if selected_model_name else "Loading...")
+    html = html.replace('{{ model_name }}', model_label)
     html = html.replace('value="arb_Arab" >', 'value="arb_Arab" selected>', 1)
     
     return html
 
+@app.route('/')
+def index():
+    return render_index(f"Using: {selected_model_name}" if selected_model_name else "Loading...")
+
 @app.route('/model_status', methods=['GET'])
 def model_status():
     return jsonify(loading_status)
@@ -699,6 +1659,7 @@ def translate_endpoint():
         text = data.get('text', '')
         source_lang = data.get('source_lang', 'eng_Latn')
         target_lang = data.get('target_lang', 'arb_Arab')
+        fmt = data.get('format', 'text')
         
         if not text.strip():
             return jsonify({'error': 'No text provided'}), 400
@@ -712,12 +1673,39 @@ def translate_endpoint():
         if source_lang not in LANGUAGES or target_lang not in LANGUAGES:
             return jsonify({'error': 'Unsupported language'}), 400
         
-        translation = translate_text(text, source_lang, target_lang)
+        if fmt not in MARKUP_FORMATS:
+            return jsonify({'error': f"Unsupported format, use one of: {', '.join(MARKUP_FORMATS)}"}), 400
+        
+        client = get_client_id()
+        cost = estimate_cost(text)
+        
+        allowed, retry_after = take_budget(client, cost)
+        if not allowed:
+            with scheduler_cond:
+                scheduler_state["rate_limited"] += 1
+            response = jsonify({'error': 'Rate limit exceeded, try again later', 'retry_after': round(retry_after, 1)})
+            response.headers['Retry-After'] = str(int(retry_after) + 1)
+            return response, 429
+        
+        job = acquire_slot(client, cost, time.time() + REQUEST_SLO_SECONDS)
+        if job is None:
+            refund_budget(client, cost)
+            response = jsonify({'error': 'Server busy, request cannot finish in time', 'retry_after': REQUEST_SLO_SECONDS})
+            response.headers['Retry-After'] = str(REQUEST_SLO_SECONDS)
+            return response, 503
+        
+        succeeded = False
+        try:
+            translation = translate_document(text, source_lang, target_lang, fmt)
+            succeeded = True
+        finally:
+            release_slot(job, succeeded)
         
         return jsonify({
             'translation': translation,
             'source_lang': source_lang,
             'target_lang': target_lang,
+            'format': fmt,
             'success': True
         })
     
@@ -730,7 +1718,344 @@ def translate_endpoint():
 def get_languages():
     return jsonify({'languages': LANGUAGES})
 
+@app.route('/pipeline_stats', methods=['GET'])
+def pipeline_stats_endpoint():
+    return jsonify(get_pipeline_stats())
+
+@app.route('/scheduler_stats', methods=['GET'])
+def scheduler_stats_endpoint():
+    return jsonify(get_scheduler_stats())
+
+# ============================================================
+# Router mode: fronts several translator backends over HTTP
+# ============================================================
+
+router_app = Flask(__name__)
+
+def hash_key(key):
+    return int(hashlib.md5(key.encode('utf-8')).hexdigest()[:16], 16)
+
+def build_router_ring(backend_urls):
+    """Place every backend on a consistent hash ring with virtual nodes"""
+    global router_backends, router_ring, router_ring_keys
+    
+    router_backends = [{"url": url.rstrip('/'), "healthy": False, "inflight": 0,
+                        "requests": 0, "failures": 0, "message": "Not checked yet"}
+                       for url in backend_urls]
+    router_ring = sorted((hash_key(f"{backend['url']}#{v}"), i)
+                         for i, backend in enumerate(router_backends)
+                         for v in range(ROUTER_VIRTUAL_NODES))
+    router_ring_keys = [h for h, _ in router_ring]
+
+def ring_order(source_lang, target_lang):
+    """Backend indexes in ring order, starting at the owner of the language pair"""
+    start = bisect.bisect(router_ring_keys, hash_key(f"{source_lang}->{target_lang}"))
+    order = []
+    
+    for offset in range(len(router_ring)):
+        index = router_ring[(start + offset) % len(router_ring)][1]
+        if index not in order:
+            order.append(index)
+            if len(order) == len(router_backends):
+                break
+    
+    return order
+
+def pick_backends(source_lang, target_lang):
+    """Healthy backends to try for a language pair, preferred one first.
+    
+    The pair's owner on the ring is preferred so each backend keeps serving
+    the same pairs. If it already has ROUTER_SPILLOVER_INFLIGHT requests in
+    flight, the next ring successor below that load takes over; when every
+    backend is busy the least loaded one goes first.
+    """
+    with router_lock:
+        healthy = [i for i in ring_order(source_lang, target_lang) if router_backends[i]["healthy"]]
+        
+        for pos, index in enumerate(healthy):
+            if router_backends[index]["inflight"] < ROUTER_SPILLOVER_INFLIGHT:
+                return healthy[pos:] + healthy[:pos]
+        
+        return sorted(healthy, key=lambda i: router_backends[i]["inflight"])
+
+def fetch_json(url, payload=None, timeout=ROUTER_REQUEST_TIMEOUT, headers=None):
+    """GET (or POST when payload is given) a JSON endpoint, returns (status, data, headers)"""
+    data = json.dumps(payload).encode('utf-8') if payload is not None else None
+    req = urllib.request.Request(url, data=data, headers={'Content-Type': 'application/json', **(headers or {})})
+    
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as res:
+            return res.status, json.loads(res.read().decode('utf-8')), res.headers
+    except urllib.error.HTTPError as e:
+        try:
+            return e.code, json.loads(e.read().decode('utf-8')), e.headers
+        except ValueError:
+            return e.code, {'error': f"HTTP {e.code}"}, e.headers
+
+def set_backend_health(backend, healthy, message):
+    with router_lock:
+        if backend["healthy"] != healthy:
+            print(f"  Backend {backend['url']}: {'UP' if healthy else 'DOWN'} ({message})")
+        backend["healthy"] = healthy
+        backend["message"] = message
+
+def check_backend(backend):
+    try:
+        status, data, _ = fetch_json(backend["url"] + '/model_status', timeout=ROUTER_HEALTH_TIMEOUT)
+        healthy = status == 200 and bool(data.get('complete'))
+        message = data.get('message', '') or f"HTTP {status}"
+    except Exception as e:
+        healthy, message = False, str(e)
+    
+    set_backend_health(backend, healthy, message)
+
+def health_check_loop():
+    while True:
+        for backend in router_backends:
+            check_backend(backend)
+        time.sleep(ROUTER_HEALTH_INTERVAL)
+
+def forward_translate(payload, headers=None):
+    """Send a translate request to the preferred backend, failing over on errors.
+    
+    Returns (data, status, retry_after); retry_after is the backend's
+    Retry-After header for rate-limited or shed requests, otherwise None.
+    A backend shedding load is skipped without being marked down, and the
+    shed 503 is only returned once every candidate has shed, with the
+    shortest Retry-After among them.
+    """
+    candidates = pick_backends(payload.get('source_lang', 'eng_Latn'), payload.get('target_lang', 'arb_Arab'))
+    
+    if not candidates:
+        return {'error': 'No healthy translator backends'}, 503, None
+    
+    last_error = None
+    shed = None
+    for index in candidates:
+        backend = router_backends[index]
+        
+        with router_lock:
+            backend["inflight"] += 1
+            backend["requests"] += 1
+        
+        try:
+            status, data, response_headers = fetch_json(backend["url"] + '/translate', payload, headers=headers)
+        except Exception as e:
+            if isinstance(e, socket.timeout) or isinstance(getattr(e, 'reason', None), socket.timeout):
+                # A slow translation is not a dead backend, and retrying it elsewhere would only repeat the wait
+                return {'error': 'Backend timed out', 'backend': backend["url"]}, 504, None
+            status, data, response_headers = None, {'error': str(e)}, {}
+        finally:
+            with router_lock:
+                backend["inflight"] -= 1
+        
+        retry_after = response_headers.get('Retry-After')
+        if status is not None and status not in (502, 503, 504):
+            data['backend'] = backend["url"]
+            return data, status, retry_after
+        
+        # A 503 with Retry-After is the backend shedding load, not a failure
+        if status == 503 and retry_after:
+            try:
+                seconds = float(retry_after)
+            except ValueError:
+                seconds = float(REQUEST_SLO_SECONDS)
+            if shed is None or seconds < shed[0]:
+                data['backend'] = backend["url"]
+                shed = (seconds, data, retry_after)
+            continue
+        
+        # Connection failures and gateway/unavailable answers move on to the next backend
+        last_error = data.get('error', f"HTTP {status}")
+        with router_lock:
+            backend["failures"] += 1
+        if status is None or status == 503:
+            set_backend_health(backend, False, last_error)
+        print(f"\n✗ Backend {backend['url']} failed: {last_error}")
+    
+    if shed is not None:
+        return shed[1], 503, shed[2]
+    return {'error': f"All backends failed: {last_error}"}, 502, None
+
+@router_app.route('/')
+def router_index():
+    healthy = sum(1 for backend in router_backends if backend["healthy"])
+    return render_index(f"Router: {healthy}/{len(router_backends)} backends")
+
+@router_app.route('/model_status', methods=['GET'])
+def router_model_status():
+    healthy = sum(1 for backend in router_backends if backend["healthy"])
+    return jsonify({
+        "loading": healthy == 0,
+        "progress": 100 if healthy else 0,
+        "message": f"{healthy}/{len(router_backends)} backends ready",
+        "complete": healthy > 0
+    })
+
+@router_app.route('/router_status', methods=['GET'])
+def router_status():
+    with router_lock:
+        return jsonify({'backends': [dict(backend) for backend in router_backends]})
+
+@router_app.route('/translate', methods=['POST'])
+def router_translate():
+    data = request.get_json(silent=True)
+    if not data or not isinstance(data, dict):
+        return jsonify({'error': 'No data received'}), 400
+    
+    # Pass the client identity on so backends can schedule fairly per client
+    headers = {'X-Forwarded-For': ', '.join(filter(None, [request.headers.get('X-Forwarded-For'), request.remote_addr]))}
+    if request.headers.get('X-API-Key'):
+        headers['X-API-Key'] = request.headers['X-API-Key']
+    
+    result, status, retry_after = forward_translate(data, headers)
+    response = jsonify(result)
+    if retry_after:
+        response.headers['Retry-After'] = retry_after
+    return response, status
+
+@router_app.route('/languages', methods=['GET'])
+def router_languages():
+    return jsonify({'languages': LANGUAGES})
+
+def run_router(host, port, backend_urls):
+    print("\n" + "="*60)
+    print("ROUTER MODE")
+    print("="*60)
+    
+    build_router_ring(backend_urls)
+    for backend in router_backends:
+        print(f"Backend: {backend['url']}")
+        check_backend(backend)
+    
+    threading.Thread(target=health_check_loop, daemon=True).start()
+    
+    print("="*60)
+    print(f"Router: http://localhost:{port}")
+    print("Press Ctrl+C to stop")
+    print("="*60 + "\n")
+    
+    try:
+        router_app.run(debug=False, host=host, port=port, threaded=True)
+    except KeyboardInterrupt:
+        print("\n\nRouter stopped")
+
+# ============================================================
+# Stand-in backend: echo translator for trying router mode locally
+# ============================================================
+
+stand_in_app = Flask(__name__)
+STAND_IN_DELAY = 0.0
+
+@stand_in_app.route('/model_status', methods=['GET'])
+def stand_in_model_status():
+    return jsonify({"loading": False, "progress": 100, "message": "Stand-in ready", "complete": True})
+
+@stand_in_app.route('/translate', methods=['POST'])
+def stand_in_translate():
+    data = request.get_json(silent=True)
+    if not data or not isinstance(data, dict):
+        return jsonify({'error': 'No data received'}), 400
+    
+    text = data.get('text', '')
+    if not isinstance(text, str) or not text.strip():
+        return jsonify({'error': 'No text provided'}), 400
+    
+    time.sleep(STAND_IN_DELAY)
+    
+    return jsonify({
+        'translation': text,
+        'source_lang': data.get('source_lang', 'eng_Latn'),
+        'target_lang': data.get('target_lang', 'arb_Arab'),
+        'format': data.get('format', 'text'),
+        'stand_in': True,
+        'success': True
+    })
+
+@stand_in_app.route('/languages', methods=['GET'])
+def stand_in_languages():
+    return jsonify({'languages': LANGUAGES})
+
+def run_stand_in(host, port):
+    print("\n" + "="*60)
+    print("STAND-IN BACKEND (echo, no model loaded)")
+    print("="*60)
+    print(f"Server: http://localhost:{port}")
+    print(f"Delay: {STAND_IN_DELAY}s per request")
+    print("Press Ctrl+C to stop")
+    print("="*60 + "\n")
+    
+    try:
+        stand_in_app.run(debug=False, host=host, port=port, threaded=True)
+    except KeyboardInterrupt:
+        print("\n\nStand-in stopped")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="xsukax Offline AI Translator")
+    parser.add_argument('--model', choices=sorted(AVAILABLE_MODELS), help="Model choice, skips the selection menu")
+    parser.add_argument('--host', default='0.0.0.0', help="Address to bind (default: 0.0.0.0)")
+    parser.add_argument('--port', type=int, default=5000, help="Port to listen on (default: 5000)")
+    parser.add_argument('--router', action='store_true', help="Run as a router in front of --backend servers")
+    parser.add_argument('--stand-in', action='store_true',
+                        help="Serve an echo translator without loading a model, for trying router mode locally")
+    parser.add_argument('--stand-in-delay', type=float, default=0.0, metavar='SECONDS',
+                        help="Seconds each stand-in translation takes (default: 0)")
+    parser.add_argument('--autotune', action='store_true',
+                        help="Calibrate threads, batch size and precision for this host if no saved tuning exists")
+    parser.add_argument('--backend', action='append', default=[], metavar='URL',
+                        help="Translator backend URL for router mode, repeat for each backend")
+    parser.add_argument('--slo', type=float, default=REQUEST_SLO_SECONDS, metavar='SECONDS',
+                        help=f"Reject requests that cannot finish within this time (default: {REQUEST_SLO_SECONDS})")
+    parser.add_argument('--slots', type=int, default=SCHEDULER_SLOTS, metavar='N',
+                        help=f"Translations run at the same time, each sharing the CPU threads (default: {SCHEDULER_SLOTS})")
+    parser.add_argument('--client-budget', type=float, default=CLIENT_BUDGET_CAPACITY, metavar='COST',
+                        help=f"Burst cost budget per client (default: {CLIENT_BUDGET_CAPACITY:g})")
+    parser.add_argument('--client-refill', type=float, default=CLIENT_BUDGET_REFILL, metavar='COST',
+                        help=f"Cost budget refilled per client per second (default: {CLIENT_BUDGET_REFILL:g})")
+    parser.add_argument('--client-weight', action='append', default=[], metavar='CLIENT=WEIGHT',
+                        help="Fair-share weight for a client (key:<api key> or ip:<address>), repeatable")
+    parser.add_argument('--trusted-proxy', action='append', default=[], metavar='ADDR',
+                        help="Take the client IP from X-Forwarded-For for requests from this address, repeatable")
+    parser.add_argument('--api-key', action='append', default=[], metavar='KEY',
+                        help="API key accepted in X-API-Key as a client identity, repeatable")
+    
+    args = parser.parse_args()
+    if args.router and not args.backend:
+        parser.error("--router needs at least one --backend")
+    if args.slots < 1:
+        parser.error("--slots must be at least 1")
+    
+    args.client_weights = {}
+    for entry in args.client_weight:
+        client, _, weight = entry.rpartition('=')
+        try:
+            args.client_weights[client] = float(weight)
+            if not client or args.client_weights[client] <= 0:
+                raise ValueError
+        except ValueError:
+            parser.error(f"--client-weight expects CLIENT=WEIGHT with a positive weight, got: {entry}")
+    return args
+
 if __name__ == '__main__':
+    args = parse_args()
+    
+    if args.router:
+        run_router(args.host, args.port, args.backend)
+        sys.exit(0)
+    
+    if args.stand_in:
+        STAND_IN_DELAY = args.stand_in_delay
+        run_stand_in(args.host, args.port)
+        sys.exit(0)
+    
+    REQUEST_SLO_SECONDS = args.slo
+    SCHEDULER_SLOTS = args.slots
+    CLIENT_BUDGET_CAPACITY = args.client_budget
+    CLIENT_BUDGET_REFILL = args.client_refill
+    TRUSTED_PROXIES.update(args.trusted_proxy)
+    API_KEYS.update(args.api_key)
+    CLIENT_WEIGHTS.update(args.client_weights)
+    
     print("\n" + "="*60)
     print("xsukax Offline AI Translator v3.2")
     print("="*60)
@@ -741,11 +2066,24 @@ if __name__ == '__main__':
     print("- Max 5000 characters (auto-segmented)")
     print("- 100% offline after download\n")
     
-    chosen_model, model_display, expected_size = display_model_menu()
+    if args.model:
+        selected = AVAILABLE_MODELS[args.model]
+        chosen_model, model_display, expected_size = selected['name'], selected['display'], selected['size']
+    else:
+        chosen_model, model_display, expected_size = display_model_menu()
     
     print(f"\nApp: {APP_DIR}")
     print(f"Cache: {MODEL_CACHE_DIR}")
     
+    tuning = load_tuning(chosen_model)
+    if tuning is not None:
+        problem = check_tuning(tuning)
+        if problem:
+            print(f"\n✗ Ignoring saved tuning ({problem}), using defaults")
+            tuning = None
+        else:
+            apply_tuning(tuning)
+    
     try:
         load_model(chosen_model, model_display, expected_size)
     except KeyboardInterrupt:
@@ -755,13 +2093,19 @@ if __name__ == '__main__':
         print(f"\n\nFailed to load model: {e}")
         sys.exit(1)
     
+    if tuning is None and args.autotune:
+        try:
+            autotune_model(chosen_model)
+        except Exception as e:
+            print(f"\n✗ Auto-tuning failed, using defaults: {e}")
+    
     print("="*60)
-    print("Server: http://localhost:5000")
+    print(f"Server: http://localhost:{args.port}")
     print("Press Ctrl+C to stop")
     print("="*60 + "\n")
     
     try:
-        app.run(debug=False, host='0.0.0.0', port=5000, threaded=True)
+        app.run(debug=False, host=args.host, port=args.port, threaded=True)
     except KeyboardInterrupt:
         print("\n\nServer stopped")
         sys.exit(0)
\ No newline at end of file